@@ -1,17 +1,39 @@
 import asyncio
 import aiohttp
-import csv
+import bisect
+import contextlib
+import os
+import re
 import time
 import json
+import numpy as np
+import orjson
 import random
 import string
 from tqdm import tqdm
 import argparse
-from collections import defaultdict
-from typing import List, Dict, Any, DefaultDict, Optional, Union
+import itertools
+from collections import defaultdict, deque
+from typing import List, Dict, Any, DefaultDict, Optional, Tuple, Union
+from urllib.parse import urlsplit
 from jsonpath_ng import parse
 from termgraph import termgraph as tg
 
+try:
+    import uvloop
+except ImportError:  # uvloop is Linux/macOS only; fall back to the stock loop
+    uvloop = None
+
+try:
+    import httpx
+except ImportError:  # only needed for --http2
+    httpx = None
+
+
+MAX_STORED_RESPONSE = 4096  # bytes of response body kept per result row
+PARSE_QUEUE_SIZE = 1024  # bounded fetch->parse queue; full queue stalls fetches
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 def generate_random_string(length: int = 10) -> str:
     return "".join(random.choices(string.ascii_letters + string.digits, k=length))
@@ -35,168 +57,691 @@ def generate_json_body(template: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+BODY_BATCH_SIZE = 1024
+_ALPHABET = np.frombuffer(
+    (string.ascii_letters + string.digits).encode(), dtype="S1"
+)
+
+
+class BodyGenerator:
+    """Doles out request bodies generated from a JSON template.
+
+    Random field values are produced in vectorized NumPy batches of
+    BODY_BATCH_SIZE and handed out from a deque, instead of making
+    several Python-level random calls per request.
+    """
+
+    def __init__(self, template: Dict[str, Any]) -> None:
+        self._static = {
+            k: v
+            for k, v in template.items()
+            if not (isinstance(v, str) and v.startswith("{{random_"))
+        }
+        self._random_keys = [
+            (k, v) for k, v in template.items() if k not in self._static
+        ]
+        self._rng = np.random.default_rng()
+        self._pool: deque = deque()
+        # A template with no random placeholders always serializes to the
+        # same payload; compute those bytes exactly once.
+        self._static_bytes: Optional[bytes] = (
+            orjson.dumps(self._static) if not self._random_keys else None
+        )
+
+    def _generate_batch(self, placeholder: str) -> List[str]:
+        if placeholder == "{{random_string}}":
+            indices = self._rng.integers(
+                0, len(_ALPHABET), size=(BODY_BATCH_SIZE, 10)
+            )
+            chars = _ALPHABET[indices].view("S10").ravel()
+            return [c.decode() for c in chars]
+        elif placeholder == "{{random_int}}":
+            return [str(n) for n in self._rng.integers(1, 1000000, BODY_BATCH_SIZE)]
+        elif placeholder == "{{random_float}}":
+            values = self._rng.uniform(0, 1000, BODY_BATCH_SIZE)
+            return [str(v) for v in np.char.mod("%.2f", values)]
+        else:
+            return [placeholder] * BODY_BATCH_SIZE
+
+    def _refill(self) -> None:
+        columns = [
+            (k, self._generate_batch(placeholder))
+            for k, placeholder in self._random_keys
+        ]
+        for i in range(BODY_BATCH_SIZE):
+            body = dict(self._static)
+            for k, values in columns:
+                body[k] = values[i]
+            self._pool.append(body)
+
+    def next(self) -> Dict[str, Any]:
+        if not self._pool:
+            self._refill()
+        return self._pool.popleft()
+
+    def next_bytes(self) -> bytes:
+        """Serialized form of the next body; ~free for static templates."""
+        if self._static_bytes is not None:
+            return self._static_bytes
+        return orjson.dumps(self.next())
+
+
+def compile_json_paths(json_paths: List[str]) -> List[Tuple[str, Any]]:
+    # jsonpath_ng.parse is an expensive PLY-based parser; compile each
+    # expression once up front instead of on every response.
+    return [(path, parse(path)) for path in json_paths]
+
+
 def extract_json_values(
-    json_data: Dict[str, Any], json_paths: List[str]
+    json_data: Dict[str, Any], compiled_paths: List[Tuple[str, Any]]
 ) -> Dict[str, Any]:
     extracted_values = {}
-    for path in json_paths:
-        jsonpath_expr = parse(path)
+    for path, jsonpath_expr in compiled_paths:
         matches = [match.value for match in jsonpath_expr.find(json_data)]
         extracted_values[path] = matches[0] if matches else None
     return extracted_values
 
 
-async def make_request(
-    session: aiohttp.ClientSession,
+async def fetch_request(
+    session: Union[aiohttp.ClientSession, "httpx.AsyncClient"],
     url: str,
     method: str,
-    json_template: Optional[Dict[str, Any]],
-    json_paths: List[str],
+    body: Optional[bytes],
     semaphore: Optional[asyncio.Semaphore] = None,
-) -> Dict[str, Any]:
-    start_time = time.time()
+    launch_at: Optional[float] = None,
+    store_request_body: bool = False,
+) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """I/O half of a request: returns (metadata, raw body bytes).
+
+    `body` is the already-serialized JSON payload, so aiohttp ships the
+    bytes as-is instead of re-serializing a dict per request.
+
+    Parsing/extraction happens in build_result so it can run in a separate
+    consumer stage instead of on the coroutine issuing HTTP.
+    """
+    if launch_at is not None:
+        # Pace at send time: sleep until this request's scheduled launch
+        # deadline instead of serializing task creation on the event loop.
+        delay = launch_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    # Monotonic clock: immune to NTP steps and higher resolution than
+    # time.time(). Sampled before the semaphore acquire, so latency is
+    # queue-inclusive (time waiting for a concurrency slot counts).
+    start_time = time.perf_counter()
     try:
-        json_body = generate_json_body(json_template) if json_template else None
-        if semaphore:
-            async with semaphore:
-                if method == "GET":
-                    async with session.get(url) as response:
-                        elapsed = time.time() - start_time
-                        content = await response.text()
-                elif method == "POST":
-                    async with session.post(url, json=json_body) as response:
-                        elapsed = time.time() - start_time
-                        content = await response.text()
-                else:
-                    raise ValueError(f"Unsupported HTTP method: {method}")
-        else:
-            if method == "GET":
-                async with session.get(url) as response:
-                    elapsed = time.time() - start_time
-                    content = await response.text()
-            elif method == "POST":
-                async with session.post(url, json=json_body) as response:
-                    elapsed = time.time() - start_time
-                    content = await response.text()
+        async with semaphore if semaphore else contextlib.nullcontext():
+            if httpx is not None and isinstance(session, httpx.AsyncClient):
+                response = await session.request(
+                    method, url, content=body, headers=JSON_HEADERS if body else None
+                )
+                elapsed = time.perf_counter() - start_time
+                status = response.status_code
+                content = response.content
             else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-
-        try:
-            json_response = json.loads(content)
-            extracted_values = extract_json_values(json_response, json_paths)
-        except json.JSONDecodeError:
-            extracted_values = {path: None for path in json_paths}
-
-        return {
-            "url": url,
-            "method": method,
-            "status": response.status,
-            "latency": elapsed,
-            "request": str(response.request_info),
-            "request_body": json.dumps(json_body) if json_body else "",
-            "response": content,
-            **extracted_values,
-        }
+                async with session.request(
+                    method, url, data=body, headers=JSON_HEADERS if body else None
+                ) as response:
+                    elapsed = time.perf_counter() - start_time
+                    status = response.status
+                    content = await response.read()
+        return (
+            {
+                "url": url,
+                "method": method,
+                "status": status,
+                "latency": elapsed,
+                # method + url is all request_info adds once headers are
+                # constant; skip the per-request str() of request_info.
+                "request": f"{method} {url}",
+                "request_body": (
+                    body.decode() if body and store_request_body else ""
+                ),
+            },
+            content,
+        )
     except Exception as e:
-        return {
-            "url": url,
-            "method": method,
-            "status": "Error",
-            "latency": time.time() - start_time,
-            "request": url,
-            "request_body": json.dumps(json_body) if json_body else "",
-            "response": str(e),
-            **{path: None for path in json_paths},
-        }
+        return (
+            {
+                "url": url,
+                "method": method,
+                "status": "Error",
+                "latency": time.perf_counter() - start_time,
+                "request": f"{method} {url}",
+                "request_body": (
+                    body.decode() if body and store_request_body else ""
+                ),
+                "response": str(e),
+            },
+            None,
+        )
+
+
+def build_result(
+    metadata: Dict[str, Any],
+    content: Optional[bytes],
+    compiled_paths: List[Tuple[str, Any]],
+    store_response: bool = False,
+) -> Dict[str, Any]:
+    """CPU half of a request: parse the body and run JSONPath extraction."""
+    if content is None:  # fetch failed; metadata already carries the error
+        return {**metadata, **{path: None for path, _ in compiled_paths}}
+
+    # Don't pay for a JSON parse nobody asked for: with no --json-paths a
+    # response only contributes status + latency.
+    if not compiled_paths:
+        extracted_values = {}
+    else:
+        try:
+            json_response = orjson.loads(content)
+            extracted_values = extract_json_values(json_response, compiled_paths)
+        except orjson.JSONDecodeError:
+            extracted_values = {path: None for path, _ in compiled_paths}
+
+    return {
+        **metadata,
+        # Cap the stored body so a large response can't blow up the CSV
+        # (or RAM) when the user only wants status/latency/extractions.
+        "response": (
+            content[:MAX_STORED_RESPONSE].decode(errors="replace")
+            if store_response
+            else ""
+        ),
+        **extracted_values,
+    }
+
+
+async def make_request(
+    session: Union[aiohttp.ClientSession, "httpx.AsyncClient"],
+    url: str,
+    method: str,
+    json_body: Optional[Dict[str, Any]],
+    compiled_paths: List[Tuple[str, Any]],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    launch_at: Optional[float] = None,
+    store_response: bool = False,
+    store_request_body: bool = False,
+) -> Dict[str, Any]:
+    body = orjson.dumps(json_body) if json_body else None
+    metadata, content = await fetch_request(
+        session, url, method, body, semaphore, launch_at, store_request_body
+    )
+    return build_result(metadata, content, compiled_paths, store_response)
+
+
+def create_connector(rate_limit: int) -> aiohttp.TCPConnector:
+    # One connection pool shared by pre-check and load test: keepalive and
+    # a DNS cache keep connections warm so handshakes amortize across the run.
+    return aiohttp.TCPConnector(
+        limit=rate_limit * 4,
+        limit_per_host=rate_limit * 4,
+        ttl_dns_cache=300,
+        keepalive_timeout=60,
+        enable_cleanup_closed=True,
+    )
 
 
 async def pre_check(
+    session: Union[aiohttp.ClientSession, "httpx.AsyncClient"],
     url: str,
     method: str,
     json_template: Optional[Dict[str, Any]],
-    json_paths: List[str],
+    compiled_paths: List[Tuple[str, Any]],
 ) -> Dict[str, Any]:
-    async with aiohttp.ClientSession() as session:
-        result = await make_request(session, url, method, json_template, json_paths)
-    return result
+    # Always keep the body here: the pre-check failure message shows it.
+    json_body = generate_json_body(json_template) if json_template else None
+    return await make_request(
+        session,
+        url,
+        method,
+        json_body,
+        compiled_paths,
+        store_response=True,
+        store_request_body=True,
+    )
+
+
+# Latency buckets for the summary histogram, in seconds.
+LATENCY_RANGES = [
+    (0, 0.1),
+    (0.1, 0.25),
+    (0.25, 0.5),
+    (0.5, 0.75),
+    (0.75, 1),
+    (1, 1.5),
+    (1.5, 2),
+    (2, 3),
+    (3, 5),
+    (5, float("inf")),
+]
+# Sorted upper edges of the finite buckets; bisecting this places a sample
+# in O(log B) instead of scanning the ranges.
+BUCKET_EDGES = [high for _, high in LATENCY_RANGES[:-1]]
+
+
+class StatsAccumulator:
+    """Online summary statistics, updated once per completed request.
+
+    Keeps the summary pass O(1) in request count: results stream to the
+    CSV as they complete and only these aggregates stay in memory.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_latency = 0.0
+        self.min_latency = float("inf")
+        self.max_latency = 0.0
+        self.status_counts: DefaultDict[Any, int] = defaultdict(int)
+        self.method_counts: DefaultDict[str, int] = defaultdict(int)
+        self.histogram = [0] * len(LATENCY_RANGES)
+
+    def update(self, result: Dict[str, Any]) -> None:
+        latency = result["latency"]
+        self.count += 1
+        self.total_latency += latency
+        self.min_latency = min(self.min_latency, latency)
+        self.max_latency = max(self.max_latency, latency)
+        self.status_counts[result["status"]] += 1
+        self.method_counts[result["method"]] += 1
+        self.histogram[bisect.bisect_right(BUCKET_EDGES, latency)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-th latency quantile (0 < q <= 1) from the histogram.
+
+        Walks the cumulative bucket counts and linearly interpolates within
+        the winning bucket, clamped to the observed min/max.
+        """
+        target = q * self.count
+        cumulative = 0
+        for (low, high), count in zip(LATENCY_RANGES, self.histogram):
+            if count == 0:
+                continue
+            if cumulative + count >= target:
+                low = max(low, self.min_latency)
+                high = min(high, self.max_latency)
+                fraction = (target - cumulative) / count
+                return low + fraction * (high - low)
+            cumulative += count
+        return self.max_latency
 
 
 async def load_test(
+    session: Union[aiohttp.ClientSession, "httpx.AsyncClient"],
     urls: List[str],
     method: str,
     json_template: Optional[Dict[str, Any]],
-    json_paths: List[str],
+    compiled_paths: List[Tuple[str, Any]],
     rate_limit: int,
     total_requests: int,
-) -> List[Dict[str, Any]]:
-    results: List[Dict[str, Any]] = []
+    writer: "ReportWriter",
+    stats: StatsAccumulator,
+    store_response: bool = False,
+    store_request_body: bool = False,
+) -> None:
     semaphore = asyncio.Semaphore(rate_limit)
-
-    async with aiohttp.ClientSession() as session:
-        tasks: List[asyncio.Task] = []
-        with tqdm(total=total_requests, desc="Requests", unit="req") as pbar:
-            for i in range(total_requests):
-                url = urls[i % len(urls)]
-                task = asyncio.create_task(
-                    make_request(
-                        session, url, method, json_template, json_paths, semaphore
+    interval = 1.0 / rate_limit
+    body_generator = BodyGenerator(json_template) if json_template else None
+
+    # Producer-consumer split: fetch coroutines push (metadata, raw bytes)
+    # onto a bounded queue and a small worker pool does the CPU half
+    # (orjson parse + JSONPath extraction) plus the row write, so parsing
+    # never runs on the coroutines issuing HTTP and the queue provides
+    # backpressure if extraction falls behind.
+    queue: "asyncio.Queue" = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+
+    async def produce(url: str, body: Optional[bytes], at: float):
+        await queue.put(
+            await fetch_request(
+                session, url, method, body, semaphore, at, store_request_body
+            )
+        )
+
+    async def consume(pbar: tqdm) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            metadata, content = item
+            result = build_result(metadata, content, compiled_paths, store_response)
+            # Stream each row to disk and fold it into the running stats
+            # instead of accumulating every result dict in RAM.
+            writer.writerow(result)
+            stats.update(result)
+            pbar.update(1)
+
+    # Throttle progress redraws: refresh at most every 250 ms and only
+    # after ~0.1% of requests, instead of bookkeeping on every completion.
+    with tqdm(
+        total=total_requests,
+        desc="Requests",
+        unit="req",
+        mininterval=0.25,
+        miniters=max(1, total_requests // 1000),
+    ) as pbar:
+        async with asyncio.TaskGroup() as task_group:
+            consumers = [
+                task_group.create_task(consume(pbar))
+                for _ in range(os.cpu_count() or 1)
+            ]
+            # Create all fetch tasks up front with precomputed launch
+            # deadlines (t0 + i/rate); each task sleeps until its own
+            # deadline, so pacing happens at send time and task creation
+            # never blocks on the loop.
+            async with asyncio.TaskGroup() as producer_group:
+                start = asyncio.get_running_loop().time()
+                url_cycle = itertools.cycle(urls)
+                for i in range(total_requests):
+                    producer_group.create_task(
+                        produce(
+                            next(url_cycle),
+                            body_generator.next_bytes() if body_generator else None,
+                            start + i * interval,
+                        )
                     )
-                )
-                task.add_done_callback(lambda t: results.append(t.result()))
-                task.add_done_callback(lambda _: pbar.update(1))
-                tasks.append(task)
+            for _ in consumers:
+                await queue.put(None)
+
+
+# --- Raw-socket backend -----------------------------------------------------
+# Optional low-overhead backend (--io-backend rawsocket): HTTP/1.1 request
+# bytes are built once per request up front and sent over a small pool of
+# persistent connections via asyncio streams, skipping aiohttp's per-request
+# machinery entirely. http:// targets only; no chunked *request* bodies.
+
+
+def build_raw_request(method: str, url: str, body: Optional[bytes]) -> bytes:
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {parts.netloc}",
+        "Connection: keep-alive",
+        "Accept: */*",
+    ]
+    if body is not None:
+        lines.append("Content-Type: application/json")
+        lines.append(f"Content-Length: {len(body)}")
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode()
+    return request + body if body is not None else request
+
+
+async def _read_raw_response(
+    reader: asyncio.StreamReader,
+) -> Tuple[int, bytes, bool]:
+    """Read one HTTP/1.1 response; returns (status, body, connection_reusable)."""
+    header_block = await reader.readuntil(b"\r\n\r\n")
+    status_line, _, header_text = header_block.partition(b"\r\n")
+    status = int(status_line.split(b" ", 2)[1])
+    headers = {}
+    for line in header_text.rstrip(b"\r\n").split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get(b"transfer-encoding", b"").lower() == b"chunked":
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.strip(), 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)  # trailing CRLF
+        body = b"".join(chunks)
+    elif b"content-length" in headers:
+        body = await reader.readexactly(int(headers[b"content-length"]))
+    else:
+        body = await reader.read()
 
-                if i < total_requests - 1:
-                    await asyncio.sleep(1 / rate_limit)  # Rate limiting
+    reusable = headers.get(b"connection", b"").lower() != b"close"
+    return status, body, reusable
 
-            await asyncio.gather(*tasks)
 
-    return results
+# Maximum number of already-due requests pipelined per write+drain; one
+# flush (and usually one send syscall) covers the whole batch.
+SUBMIT_BATCH = 64
 
 
-def write_report(
-    results: List[Dict[str, Any]], output_file: str, json_paths: List[str]
+async def _raw_worker(
+    items: List[Tuple[str, str, int, bytes, Optional[bytes], float]],
+    compiled_paths: List[Tuple[str, Any]],
+    writer: "ReportWriter",
+    stats: StatsAccumulator,
+    pbar: tqdm,
+    store_response: bool,
+    store_request_body: bool,
 ) -> None:
-    fieldnames = [
-        "url",
-        "method",
-        "status",
-        "latency",
-        "request",
-        "request_body",
-        "response",
-    ] + json_paths
-    with open(output_file, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for result in results:
-            writer.writerow(result)
-
+    loop = asyncio.get_running_loop()
+    connection: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+    index = 0
+    while index < len(items):
+        url, host, port, raw_request, request_body, launch_at = items[index]
+
+        delay = launch_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # Pipeline every consecutive request to the same host whose launch
+        # deadline has already passed, up to SUBMIT_BATCH per flush.
+        batch = [items[index]]
+        index += 1
+        now = loop.time()
+        while (
+            index < len(items)
+            and len(batch) < SUBMIT_BATCH
+            and items[index][1] == host
+            and items[index][2] == port
+            and items[index][5] <= now
+        ):
+            batch.append(items[index])
+            index += 1
+
+        start_time = time.perf_counter()
+        completed = 0
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port)
+            reader, sock_writer = connection
+            sock_writer.write(b"".join(item[3] for item in batch))
+            await sock_writer.drain()
+
+            for item_url, _, _, item_request, item_body, _ in batch:
+                status, content, reusable = await _read_raw_response(reader)
+                elapsed = time.perf_counter() - start_time
+
+                if not compiled_paths:
+                    extracted_values = {}
+                else:
+                    try:
+                        json_response = orjson.loads(content)
+                        extracted_values = extract_json_values(
+                            json_response, compiled_paths
+                        )
+                    except orjson.JSONDecodeError:
+                        extracted_values = {
+                            path: None for path, _ in compiled_paths
+                        }
+
+                method = item_request.split(b" ", 1)[0].decode()
+                result = {
+                    "url": item_url,
+                    "method": method,
+                    "status": status,
+                    "latency": elapsed,
+                    "request": f"{method} {item_url}",
+                    "request_body": (
+                        item_body.decode()
+                        if item_body and store_request_body
+                        else ""
+                    ),
+                    "response": (
+                        content[:MAX_STORED_RESPONSE].decode(errors="replace")
+                        if store_response
+                        else ""
+                    ),
+                    **extracted_values,
+                }
+                writer.writerow(result)
+                stats.update(result)
+                pbar.update(1)
+                completed += 1
+
+                if not reusable:
+                    # Server won't honor the rest of the pipeline; resend
+                    # the unanswered requests on a fresh connection.
+                    sock_writer.close()
+                    connection = None
+                    remaining = batch[completed:]
+                    if remaining:
+                        connection = await asyncio.open_connection(host, port)
+                        reader, sock_writer = connection
+                        sock_writer.write(b"".join(item[3] for item in remaining))
+                        await sock_writer.drain()
+        except Exception as e:
+            if connection is not None:
+                connection[1].close()
+                connection = None
+            for item_url, _, _, item_request, item_body, _ in batch[completed:]:
+                method = item_request.split(b" ", 1)[0].decode()
+                result = {
+                    "url": item_url,
+                    "method": method,
+                    "status": "Error",
+                    "latency": time.perf_counter() - start_time,
+                    "request": f"{method} {item_url}",
+                    "request_body": (
+                        item_body.decode()
+                        if item_body and store_request_body
+                        else ""
+                    ),
+                    "response": str(e),
+                    **{path: None for path, _ in compiled_paths},
+                }
+                writer.writerow(result)
+                stats.update(result)
+                pbar.update(1)
+
+    if connection is not None:
+        connection[1].close()
+
+
+async def raw_load_test(
+    urls: List[str],
+    method: str,
+    json_template: Optional[Dict[str, Any]],
+    compiled_paths: List[Tuple[str, Any]],
+    rate_limit: int,
+    total_requests: int,
+    writer: "ReportWriter",
+    stats: StatsAccumulator,
+    store_response: bool = False,
+    store_request_body: bool = False,
+) -> None:
+    interval = 1.0 / rate_limit
+    body_generator = BodyGenerator(json_template) if json_template else None
+    hosts = {
+        url: (urlsplit(url).hostname, urlsplit(url).port or 80) for url in urls
+    }
 
-def create_latency_chart(results: List[Dict[str, Any]]) -> None:
-    latencies = [result["latency"] for result in results]
-
-    # Create latency ranges
-    ranges = [
-        (0, 0.1),
-        (0.1, 0.25),
-        (0.25, 0.5),
-        (0.5, 0.75),
-        (0.75, 1),
-        (1, 1.5),
-        (1.5, 2),
-        (2, 3),
-        (3, 5),
-        (5, float("inf")),
+    # Round-robin the request schedule across one item list per worker;
+    # each worker owns its slice and can pipeline consecutive due items.
+    worker_items: List[List[Tuple[str, str, int, bytes, Optional[bytes], float]]] = [
+        [] for _ in range(rate_limit)
     ]
+    start = asyncio.get_running_loop().time()
+    url_cycle = itertools.cycle(urls)
+    for i in range(total_requests):
+        url = next(url_cycle)
+        host, port = hosts[url]
+        body = body_generator.next_bytes() if body_generator is not None else None
+        worker_items[i % rate_limit].append(
+            (
+                url,
+                host,
+                port,
+                build_raw_request(method, url, body),
+                body,
+                start + i * interval,
+            )
+        )
+
+    # Throttle progress redraws: refresh at most every 250 ms and only
+    # after ~0.1% of requests, instead of bookkeeping on every completion.
+    with tqdm(
+        total=total_requests,
+        desc="Requests",
+        unit="req",
+        mininterval=0.25,
+        miniters=max(1, total_requests // 1000),
+    ) as pbar:
+        async with asyncio.TaskGroup() as task_group:
+            for items in worker_items:
+                if items:
+                    task_group.create_task(
+                        _raw_worker(
+                            items,
+                            compiled_paths,
+                            writer,
+                            stats,
+                            pbar,
+                            store_response,
+                            store_request_body,
+                        )
+                    )
+
+
+# Matches any character that forces a CSV field to be quoted.
+_CSV_NEEDS_QUOTING = re.compile(r'[,"\r\n]')
+
+
+class ReportWriter:
+    """CSV writer specialized for the fixed report field order.
+
+    csv.DictWriter does a dict lookup plus Python-level quoting logic per
+    field per row; this serializes each row with one str.join and only
+    quotes fields that actually need it.
+    """
+
+    def __init__(self, csvfile: Any, json_paths: List[str]) -> None:
+        self._fieldnames = [
+            "url",
+            "method",
+            "status",
+            "latency",
+            "request",
+            "request_body",
+            "response",
+        ] + json_paths
+        self._file = csvfile
+        self._file.write(",".join(map(self._quote, self._fieldnames)) + "\r\n")
+
+    @staticmethod
+    def _quote(value: Any) -> str:
+        if value is None:
+            return ""
+        text = value if isinstance(value, str) else str(value)
+        if _CSV_NEEDS_QUOTING.search(text):
+            return '"' + text.replace('"', '""') + '"'
+        return text
+
+    def writerow(self, row: Dict[str, Any]) -> None:
+        quote = self._quote
+        self._file.write(
+            ",".join(quote(row.get(field)) for field in self._fieldnames) + "\r\n"
+        )
 
-    # Count latencies in each range
-    counts = [sum(1 for l in latencies if r[0] <= l < r[1]) for r in ranges]
 
+def create_report_writer(csvfile: Any, json_paths: List[str]) -> ReportWriter:
+    return ReportWriter(csvfile, json_paths)
+
+
+def create_latency_chart(stats: StatsAccumulator) -> None:
     # Prepare data for termgraph
     data = [
         [f"{r[0]}-{r[1] if r[1] != float('inf') else '5+'}s", count]
-        for r, count in zip(ranges, counts)
+        for r, count in zip(LATENCY_RANGES, stats.histogram)
         if count > 0
     ]
 
@@ -220,35 +765,30 @@ def create_latency_chart(results: List[Dict[str, Any]]) -> None:
     tg.chart(colors=["blue"], data=data, args=args, labels=labels)
 
 
-def print_summary(results: List[Dict[str, Any]]) -> None:
-    status_counts: DefaultDict[Any, int] = defaultdict(int)
-    method_counts: DefaultDict[str, int] = defaultdict(int)
-    total_latency = 0.0
-    max_latency = 0.0
-    min_latency = float("inf")
-
-    for result in results:
-        status_counts[result["status"]] += 1
-        method_counts[result["method"]] += 1
-        latency = result["latency"]
-        total_latency += latency
-        max_latency = max(max_latency, latency)
-        min_latency = min(min_latency, latency)
-
+def print_summary(stats: StatsAccumulator) -> None:
     print("\nSummary:")
-    print(f"Total requests: {len(results)}")
-    print(f"Average latency: {total_latency / len(results):.2f} seconds")
-    print(f"Min latency: {min_latency:.2f} seconds")
-    print(f"Max latency: {max_latency:.2f} seconds")
+    print(f"Total requests: {stats.count}")
+    print(f"Average latency: {stats.total_latency / stats.count:.2f} seconds")
+    print(f"Min latency: {stats.min_latency:.2f} seconds")
+    print(f"Max latency: {stats.max_latency:.2f} seconds")
+    print("\nLatency percentiles (estimated from histogram):")
+    for label, q in [
+        ("p50", 0.5),
+        ("p90", 0.9),
+        ("p95", 0.95),
+        ("p99", 0.99),
+        ("p99.9", 0.999),
+    ]:
+        print(f"  {label}: {stats.percentile(q):.3f} seconds")
     print("\nMethod distribution:")
-    for method, count in method_counts.items():
+    for method, count in stats.method_counts.items():
         print(f"  {method}: {count}")
     print("\nStatus code distribution:")
-    for status, count in status_counts.items():
+    for status, count in stats.status_counts.items():
         print(f"  {status}: {count}")
 
     # Add latency chart
-    create_latency_chart(results)
+    create_latency_chart(stats)
 
 
 async def main() -> None:
@@ -274,40 +814,114 @@ async def main() -> None:
     parser.add_argument(
         "--output", default="load_test_results.csv", help="Output CSV file name"
     )
+    parser.add_argument(
+        "--store-response",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Store (truncated) response bodies in the CSV output",
+    )
+    parser.add_argument(
+        "--store-request-body",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Store generated request bodies in the CSV output",
+    )
+    parser.add_argument(
+        "--http2",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Use an HTTP/2 httpx client: one multiplexed connection per "
+        "host instead of limit_per_host HTTP/1.1 sockets",
+    )
+    parser.add_argument(
+        "--io-backend",
+        choices=["aiohttp", "rawsocket"],
+        default="aiohttp",
+        help="HTTP backend: aiohttp (default) or a low-overhead raw-socket "
+        "backend for plain http:// targets",
+    )
     args = parser.parse_args()
 
+    if args.io_backend == "rawsocket" and any(
+        not url.startswith("http://") for url in args.urls
+    ):
+        parser.error("The rawsocket backend only supports http:// URLs")
+
+    if args.http2:
+        if httpx is None:
+            parser.error("--http2 requires the httpx package (pip install 'httpx[http2]')")
+        if args.io_backend == "rawsocket":
+            parser.error("--http2 cannot be combined with the rawsocket backend")
+
     json_template = json.loads(args.json_template) if args.json_template else None
     json_paths = args.json_paths if args.json_paths else []
+    compiled_paths = compile_json_paths(json_paths)
 
     if args.method == "POST" and not json_template:
         parser.error("POST method requires a JSON template (use --json-template)")
 
-    # Pre-check step
-    print("Performing pre-check...")
-    pre_check_result = await pre_check(
-        args.urls[0], args.method, json_template, json_paths
-    )
-
-    if pre_check_result["status"] == "Error" or pre_check_result["status"] >= 400:
-        print(f"Pre-check failed. Error: {pre_check_result['response']}")
-        user_input = input(
-            "Do you want to continue with the load test? (y/n): "
-        ).lower()
-        if user_input != "y":
-            print("Exiting the script.")
-            return
-
-    print(
-        f"Starting load test with {args.requests} {args.method} requests at {args.rate} requests per second"
-    )
-    results = await load_test(
-        args.urls, args.method, json_template, json_paths, args.rate, args.requests
-    )
+    if args.http2:
+        # A handful of multiplexed HTTP/2 connections replaces the per-host
+        # HTTP/1.1 socket pool entirely.
+        client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        )
+    else:
+        client = aiohttp.ClientSession(connector=create_connector(args.rate))
+    async with client as session:
+        # Pre-check step
+        print("Performing pre-check...")
+        pre_check_result = await pre_check(
+            session, args.urls[0], args.method, json_template, compiled_paths
+        )
+
+        if pre_check_result["status"] == "Error" or pre_check_result["status"] >= 400:
+            print(f"Pre-check failed. Error: {pre_check_result['response']}")
+            user_input = input(
+                "Do you want to continue with the load test? (y/n): "
+            ).lower()
+            if user_input != "y":
+                print("Exiting the script.")
+                return
+
+        print(
+            f"Starting load test with {args.requests} {args.method} requests at {args.rate} requests per second"
+        )
+        stats = StatsAccumulator()
+        with open(args.output, "w", newline="", buffering=1 << 20) as csvfile:
+            writer = create_report_writer(csvfile, json_paths)
+            if args.io_backend == "rawsocket":
+                await raw_load_test(
+                    args.urls,
+                    args.method,
+                    json_template,
+                    compiled_paths,
+                    args.rate,
+                    args.requests,
+                    writer,
+                    stats,
+                    store_response=args.store_response,
+                    store_request_body=args.store_request_body,
+                )
+            else:
+                await load_test(
+                    session,
+                    args.urls,
+                    args.method,
+                    json_template,
+                    compiled_paths,
+                    args.rate,
+                    args.requests,
+                    writer,
+                    stats,
+                    store_response=args.store_response,
+                    store_request_body=args.store_request_body,
+                )
 
-    write_report(results, args.output, json_paths)
     print(f"\nDetailed results written to {args.output}")
 
-    print_summary(results)
+    print_summary(stats)
 
 
 ## ART
@@ -324,4 +938,8 @@ if __name__ == "__main__":
     print(design)
     print("Load Testing: Try to blow up your service.")
     print("=" * 40)
+    if uvloop is not None:
+        # libuv-backed event loop: 2-4x faster than the stock loop on
+        # socket-heavy workloads, with no other code changes needed.
+        uvloop.install()
     asyncio.run(main())